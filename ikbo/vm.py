@@ -1,106 +1,252 @@
 
+import array
+import linecache
+import mmap
+import os
+import stat
+import struct
 import sys
-from typing import List, Tuple
+from string import Template
+from typing import Dict, List, Tuple, Union
 
 
 RAM_SIZE = 1024
 REG_COUNT = 32        
+WORD_MASK = 0xFFFFFFFF  # ячейки и регистры 32-битные, ADD переполняется по модулю 2**32
+# typecode 32-битного беззнакового целого для array: размер "I" стандартом C
+# не зафиксирован, поэтому ширина ячеек выбирается явно
+WORD_TYPECODE = next(t for t in "IL" if array.array(t).itemsize == 4)
+
+# программа — байты из файла либо отображение файла в память
+Program = Union[bytes, mmap.mmap]
+
+_U5 = struct.Struct("<BBBBB").unpack_from
+_U4 = struct.Struct("<BBBB").unpack_from
+_U3 = struct.Struct("<BBB").unpack_from
+
+
+# Быстрые обработчики генерируются при импорте: раскладка полей каждой
+# инструкции задана таблицей, и декодирование подставляется прямо в тело
+# обработчика в виде выражений со сдвигами и масками-литералами.
+#
+# Поле — список частей (номер байта, сдвиг вправо, маска, сдвиг влево),
+# значения частей объединяются через |.
+_SRC_REG = [(1, 3, 0x1F, 0)]
+
+_OPCODES = [
+    ("load", 67, 5, {
+        "const": [(1, 0, 0xFF, 0), (2, 0, 0xFF, 8), (3, 0, 0xFF, 16), (4, 0, 0x01, 24)],
+        "dst_reg": [(4, 1, 0x1F, 0)],
+    }, """
+    reg[$dst_reg] = $const
+"""),
+    ("read", 200, 4, {
+        "src_reg": _SRC_REG,
+        "offset": [(1, 0, 0x07, 4), (2, 4, 0x0F, 0)],
+        "dst_reg": [(2, 0, 0x0F, 1), (3, 7, 0x01, 0)],
+    }, """
+    addr = reg[$src_reg] + $offset
+    if addr >= RAM_SIZE:
+        raise RuntimeError(f"READ: адрес вне памяти: {addr}")
+    reg[$dst_reg] = ram[addr]
+"""),
+    ("write", 80, 3, {
+        "src_reg": _SRC_REG,
+        "dst_reg": [(1, 0, 0x07, 2), (2, 6, 0x03, 0)],
+    }, """
+    addr = reg[$dst_reg]
+    if addr >= RAM_SIZE:
+        raise RuntimeError(f"WRITE: адрес вне памяти: {addr}")
+    ram[addr] = reg[$src_reg]
+"""),
+    ("add", 178, 4, {
+        "src_reg": _SRC_REG,
+        "addr": [(1, 0, 0x07, 9), (2, 0, 0xFF, 1), (3, 7, 0x01, 0)],
+        "addr_reg": [(3, 2, 0x1F, 0)],
+    }, """
+    addr = $addr
+    result = (reg[$src_reg] + ram[reg[$addr_reg]]) & WORD_MASK
+    if addr >= RAM_SIZE:
+        raise RuntimeError(f"ADD: адрес назначения вне памяти: {addr}")
+    ram[addr] = result
+"""),
+]
+
+
+def _field_expr(parts: List[Tuple[int, int, int, int]]) -> str:
+    terms = []
+    for byte, rshift, mask, lshift in parts:
+        term = f"b{byte}"
+        if rshift:
+            term = f"({term} >> {rshift})"
+        if mask != 0xFF >> rshift:
+            term = f"({term} & 0x{mask:02X})"
+        if lshift:
+            term = f"({term} << {lshift})"
+        terms.append(term)
+    return " | ".join(terms)
+
+
+def _field_exprs(fields: Dict[str, List[Tuple[int, int, int, int]]]) -> Dict[str, str]:
+    exprs = {}
+    for field, parts in fields.items():
+        expr = _field_expr(parts)
+        exprs[field] = expr if len(parts) == 1 else f"({expr})"
+    return exprs
+
+
+def _gen_handler(name: str, size: int, fields: Dict[str, List[Tuple[int, int, int, int]]], body: str) -> str:
+    operands = ", ".join(f"b{i}" for i in range(1, size))
+    return (
+        f"def _exec_{name}(reg, ram, program, pc):\n"
+        f"    _, {operands} = _U{size}(program, pc)\n"
+        + Template(body.lstrip("\n")).substitute(_field_exprs(fields))
+    )
+
+
+def _gen_decoder(name: str, size: int, fields: Dict[str, List[Tuple[int, int, int, int]]]) -> str:
+    operands = ", ".join(f"b{i}" for i in range(1, size))
+    values = ", ".join(_field_exprs(fields).values())
+    if len(fields) == 1:
+        values += ","
+    return (
+        f"def _decode_{name}(program, pc):\n"
+        f"    _, {operands} = _U{size}(program, pc)\n"
+        f"    return ({values})\n"
+    )
+
+
+# Из той же таблицы генерируются и декодеры _decode_<name>, возвращающие
+# поля инструкции в порядке _OPCODES: ими пользуется трассировка (--test),
+# так что быстрый путь и трассировка декодируют по одной раскладке полей.
+_HANDLERS_SRC = "\n\n".join(
+    _gen_handler(name, size, fields, body) + "\n\n" + _gen_decoder(name, size, fields)
+    for name, _, size, fields, body in _OPCODES
+)
+# исходник регистрируется в linecache, чтобы в трассировке исключений
+# из сгенерированных функций были видны строки кода
+linecache.cache["<vm-handlers>"] = (len(_HANDLERS_SRC), None, _HANDLERS_SRC.splitlines(True), "<vm-handlers>")
+exec(compile(_HANDLERS_SRC, "<vm-handlers>", "exec"), globals())
+
+
+def _trace_load(reg: array.array, ram: array.array, program: Program, pc: int) -> str:
+    const, dst_reg = _decode_load(program, pc)
+    reg[dst_reg] = const
+    return f"LOAD {const}, R{dst_reg} → R{dst_reg} = {const}"
+
+
+def _trace_read(reg: array.array, ram: array.array, program: Program, pc: int) -> str:
+    src_reg, offset, dst_reg = _decode_read(program, pc)
+    addr = reg[src_reg] + offset
+    if addr >= RAM_SIZE:
+        raise RuntimeError(f"READ: адрес вне памяти: {addr}")
+    value = ram[addr]
+    reg[dst_reg] = value
+    return f"READ R{src_reg}+{offset}=[{addr}]={value} → R{dst_reg} = {value}"
+
+
+def _trace_write(reg: array.array, ram: array.array, program: Program, pc: int) -> str:
+    src_reg, dst_reg = _decode_write(program, pc)
+    addr = reg[dst_reg]
+    if addr >= RAM_SIZE:
+        raise RuntimeError(f"WRITE: адрес вне памяти: {addr}")
+    ram[addr] = reg[src_reg]
+    return f"WRITE R{src_reg}={reg[src_reg]} → [{addr}] = {reg[src_reg]}"
+
+
+def _trace_add(reg: array.array, ram: array.array, program: Program, pc: int) -> str:
+    src_reg, addr, addr_reg = _decode_add(program, pc)
+    src_val = reg[src_reg]
+    mem_val = ram[reg[addr_reg]]
+    result = (src_val + mem_val) & WORD_MASK
+    if addr >= RAM_SIZE:
+        raise RuntimeError(f"ADD: адрес назначения вне памяти: {addr}")
+    ram[addr] = result
+    return f"ADD R{src_reg}={src_val} + [{reg[addr_reg]}]={mem_val} = {result} → [{addr}] = {result}"
+
+
+# opcode -> (длина инструкции в байтах, обработчик)
+_DISPATCH = {opcode: (size, globals()[f"_exec_{name}"]) for name, opcode, size, _, _ in _OPCODES}
+
+
+# то же самое, но с выводом трассировки для --test
+_TRACE_DISPATCH = {opcode: (size, globals()[f"_trace_{name}"]) for name, opcode, size, _, _ in _OPCODES}
+
 
 class VM:
     def __init__(self):
-        self.ram = [0] * RAM_SIZE
-        self.reg = [0] * REG_COUNT
+        # ячейки беззнаковые, поэтому адрес не бывает отрицательным
+        # и для проверки границ хватает сравнения addr >= RAM_SIZE
+        self.ram = array.array(WORD_TYPECODE, [0]) * RAM_SIZE
+        self.reg = array.array(WORD_TYPECODE, [0]) * REG_COUNT
         self.pc = 0
 
-    def _decode_load(self, b0: int, b1: int, b2: int, b3: int, b4: int) -> Tuple[int, int]:
-        const = (b1) | (b2 << 8) | (b3 << 16) | ((b4 & 0x01) << 24)
-        reg = (b4 >> 1) & 0x1F
-        return const, reg
-
-    def _decode_read(self, b0: int, b1: int, b2: int, b3: int) -> Tuple[int, int, int]:
-        src_reg = (b1 >> 3) & 0x1F
-        offset = ((b1 & 0x07) << 4) | (b2 >> 4)
-        dst_reg = ((b2 & 0x0F) << 1) | (b3 >> 7)
-        return src_reg, offset, dst_reg
+    def execute(self, program: Program, test_mode: bool = False):
+        if test_mode:
+            self._execute_traced(program)
+        else:
+            self._execute_fast(program)
 
-    def _decode_write(self, b0: int, b1: int, b2: int) -> Tuple[int, int]:
-        src_reg = (b1 >> 3) & 0x1F
-        dst_reg = ((b1 & 0x07) << 2) | (b2 >> 6)
-        return src_reg, dst_reg
+    def _execute_fast(self, program: Program):
+        dispatch = _DISPATCH
+        reg = self.reg
+        ram = self.ram
+        plen = len(program)
+        pc = 0
 
-    def _decode_add(self, b0: int, b1: int, b2: int, b3: int) -> Tuple[int, int, int]:
-        src_reg = (b1 >> 3) & 0x1F
-        addr = ((b1 & 0x07) << 9) | (b2 << 1) | (b3 >> 7)
-        addr_reg = (b3 >> 2) & 0x1F
-        return src_reg, addr, addr_reg
+        try:
+            while pc < plen:
+                opcode = program[pc]
+                try:
+                    size, handler = dispatch[opcode]
+                except KeyError:
+                    raise RuntimeError(f"Неизвестная инструкция: opcode=0x{opcode:02X} @ pc={pc}") from None
+                if pc + size > plen:
+                    raise RuntimeError(f"Неполная инструкция: opcode=0x{opcode:02X} @ pc={pc}")
 
+                handler(reg, ram, program, pc)
+                pc += size
+        finally:
+            self.pc = pc
 
-    def execute(self, program: bytes, test_mode: bool = False):
-        self.pc = 0
+    def _execute_traced(self, program: Program):
+        dispatch = _TRACE_DISPATCH
+        reg = self.reg
+        ram = self.ram
+        plen = len(program)
+        pc = 0
         steps = 0
+        out: List[str] = []
 
-        while self.pc < len(program):
-            opcode = program[self.pc]
-
-            if opcode == 67 and self.pc + 4 < len(program):
-                b = program[self.pc:self.pc+5]
-                const, reg = self._decode_load(*b)
-                self.reg[reg] = const
-                if test_mode:
-                    print(f"LOAD {const}, R{reg} → R{reg} = {const}")
-                self.pc += 5
-
-            elif opcode == 200 and self.pc + 3 < len(program):
-                b = program[self.pc:self.pc+4]
-                src_reg, offset, dst_reg = self._decode_read(*b)
-                addr = self.reg[src_reg] + offset
-                if not (0 <= addr < RAM_SIZE):
-                    raise RuntimeError(f"READ: адрес вне памяти: {addr}")
-                value = self.ram[addr]
-                self.reg[dst_reg] = value
-                if test_mode:
-                    print(f"READ R{src_reg}+{offset}=[{addr}]={value} → R{dst_reg} = {value}")
-                self.pc += 4
-
-            elif opcode == 80 and self.pc + 2 < len(program):
-                b = program[self.pc:self.pc+3]
-                src_reg, dst_reg = self._decode_write(*b)
-                addr = self.reg[dst_reg]
-                if not (0 <= addr < RAM_SIZE):
-                    raise RuntimeError(f"WRITE: адрес вне памяти: {addr}")
-                self.ram[addr] = self.reg[src_reg]
-                if test_mode:
-                    print(f"WRITE R{src_reg}={self.reg[src_reg]} → [{addr}] = {self.reg[src_reg]}")
-                self.pc += 3
-
-            elif opcode == 178 and self.pc + 3 < len(program):
-                b = program[self.pc:self.pc+4]
-                src_reg, addr, addr_reg = self._decode_add(*b)
-                src_val = self.reg[src_reg]
-                mem_val = self.ram[self.reg[addr_reg]]
-                result = src_val + mem_val
-                if not (0 <= addr < RAM_SIZE):
-                    raise RuntimeError(f"ADD: адрес назначения вне памяти: {addr}")
-                self.ram[addr] = result
-                if test_mode:
-                    print(f"ADD R{src_reg}={src_val} + [{self.reg[addr_reg]}]={mem_val} = {result} → [{addr}] = {result}")
-                self.pc += 4
+        try:
+            while pc < plen:
+                opcode = program[pc]
+                try:
+                    size, handler = dispatch[opcode]
+                except KeyError:
+                    raise RuntimeError(f"Неизвестная инструкция: opcode=0x{opcode:02X} @ pc={pc}") from None
+                if pc + size > plen:
+                    raise RuntimeError(f"Неполная инструкция: opcode=0x{opcode:02X} @ pc={pc}")
 
-            else:
-                raise RuntimeError(f"Неизвестная инструкция: opcode=0x{opcode:02X} @ pc={self.pc}")
-
-            steps += 1
+                out.append(handler(reg, ram, program, pc))
+                pc += size
+                steps += 1
 
-        if test_mode:
-            print(f"\n Выполнено {steps} инструкций.")
-            print("\n--- Регистры (ненулевые) ---")
-            for i, v in enumerate(self.reg):
+            out.append(f"\n Выполнено {steps} инструкций.")
+            out.append("\n--- Регистры (ненулевые) ---")
+            for i, v in enumerate(reg):
                 if v != 0:
-                    print(f"R{i} = {v}")
-            print("\n--- Память (ненулевые ячейки) ---")
+                    out.append(f"R{i} = {v}")
+            out.append("\n--- Память (ненулевые ячейки) ---")
             for i in range(RAM_SIZE):
-                if self.ram[i] != 0:
-                    print(f"[{i}] = {self.ram[i]}")
+                if ram[i] != 0:
+                    out.append(f"[{i}] = {ram[i]}")
+        finally:
+            self.pc = pc
+            # трасса выводится одной записью, в том числе при ошибке на середине
+            if out:
+                sys.stdout.write("\n".join(out))
+                sys.stdout.write("\n")
 
 
 def main():
@@ -114,13 +260,24 @@ def main():
 
     try:
         with open(bin_path, "rb") as f:
-            program = f.read()
+            # обычный файл отображается в память без копирования; пустой
+            # файл отобразить нельзя, а каналы, FIFO и /dev/stdin не имеют
+            # размера заранее, поэтому они читаются целиком
+            st = os.fstat(f.fileno())
+            if stat.S_ISREG(st.st_mode) and st.st_size:
+                program = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                program = f.read()
 
-        vm = VM()
-        vm.execute(program, test_mode=test_mode)
+        try:
+            vm = VM()
+            vm.execute(program, test_mode=test_mode)
 
-        if not test_mode:
-            print(f"Программа выполнена. Использовано {len(program)} байт.")
+            if not test_mode:
+                print(f"Программа выполнена. Использовано {len(program)} байт.")
+        finally:
+            if isinstance(program, mmap.mmap):
+                program.close()
 
     except FileNotFoundError:
         print(f" Файл не найден: {bin_path}", file=sys.stderr)